@@ -7,27 +7,67 @@ This version relies on external locking (e.g., wrapper script with flock)
 import os
 import sys
 import time
-import glob
+import atexit
+import signal
+import functools
+import stat
+import json
+import select
 import argparse
+import threading
 import subprocess
+from collections import deque
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 import requests
+from requests.adapters import HTTPAdapter
 import psutil
 from typing import Optional
 
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None  # Fall back to polling the directory
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # No advisory-lock probe on this platform
+
+# Files unmodified for this many seconds are not waited on before processing
+_STABLE_AGE = 10.0
+
 class OllamaMonitor:
     def __init__(self, api_url: str = "http://localhost:11434"):
         self.api_url = api_url
+        # One kept-alive connection serves every /api/ps check
+        self._session = requests.Session()
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self._ollama_procs = []
+        self._last_refresh = 0.0
+        self._cached = None  # (monotonic time, busy) of the last check
+        self._ttl = 2.0
+        self._stop_event = threading.Event()
 
     def is_busy(self) -> bool:
-        """Check if Ollama is currently busy"""
-        return self._has_loaded_models() or self._high_cpu_usage()
+        """Check if Ollama is currently busy (memoized for 2 seconds)"""
+        now = time.monotonic()
+        if self._cached and now - self._cached[0] < self._ttl:
+            return self._cached[1]
+
+        busy = self._has_loaded_models() or self._high_cpu_usage()
+        self._cached = (now, busy)
+        return busy
+
+    def invalidate(self):
+        """Drop the memoized is_busy() result"""
+        self._cached = None
 
     def _has_loaded_models(self) -> bool:
         """Check if any models are loaded via API"""
         try:
-            response = requests.get(f"{self.api_url}/api/ps", timeout=5)
+            response = self._session.get(f"{self.api_url}/api/ps", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 return len(data.get('models', [])) > 0
@@ -35,56 +75,184 @@ class OllamaMonitor:
             pass
         return False
 
+    def _refresh_ollama_procs(self):
+        """Rescan the process table for ollama processes"""
+        known = {proc.pid: proc for proc in self._ollama_procs}
+        procs = []
+        for proc in psutil.process_iter(['name']):
+            try:
+                if 'ollama' in proc.info['name'].lower():
+                    # Keep the cached object for a known process so its CPU
+                    # counter spans the refresh; prime a new one for next time
+                    cached = known.get(proc.pid)
+                    if cached is not None and cached.is_running():
+                        proc = cached
+                    else:
+                        proc.cpu_percent(None)
+                    procs.append(proc)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+        self._ollama_procs = procs
+        self._last_refresh = time.monotonic()
+
     def _high_cpu_usage(self) -> bool:
         """Check if ollama processes are using significant CPU"""
+        if time.monotonic() - self._last_refresh > 30:
+            self._refresh_ollama_procs()
+
         total_cpu = 0
-        for proc in psutil.process_iter(['name', 'cpu_percent']):
+        for proc in list(self._ollama_procs):
             try:
-                if 'ollama' in proc.info['name'].lower():
-                    total_cpu += proc.info['cpu_percent']
+                total_cpu += proc.cpu_percent(None)
             except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
+                self._ollama_procs.remove(proc)
 
         return total_cpu > 5.0
 
+    def close(self):
+        """Close the pooled HTTP connection"""
+        self._session.close()
+
+    def stop(self):
+        """Wake any wait_for_idle() call and make it return False"""
+        self._stop_event.set()
+
     def wait_for_idle(self, check_interval: int = 10, timeout: Optional[int] = None) -> bool:
-        """Wait for Ollama to become idle"""
+        """Wait for Ollama to become idle, backing off between checks"""
         start_time = time.time()
+        delay = 0.5
 
         while self.is_busy():
             if timeout and (time.time() - start_time) > timeout:
                 return False
 
-            print(f"Ollama is busy, waiting {check_interval} seconds...")
-            time.sleep(check_interval)
+            pause = min(delay, check_interval)
+            print(f"Ollama is busy, waiting {pause:g} seconds...")
+            if self._stop_event.wait(pause):
+                return False
+            delay = min(delay * 2, check_interval)
+            self.invalidate()
 
         return True
 
+def _stat(path, dir_fd=None):
+    """os.stat, resolving path by basename against dir_fd when given"""
+    if dir_fd is None:
+        return os.stat(path)
+    return os.stat(os.path.basename(path), dir_fd=dir_fd)
+
+class StatCache:
+    """Memoize os.stat results (by basename under dir_fd) for one processing pass"""
+
+    def __init__(self, dir_fd=None):
+        self._stats = {}
+        self.dir_fd = dir_fd
+
+    def get(self, path) -> Optional[os.stat_result]:
+        """Return the stat result for path, or None if it does not exist"""
+        if path not in self._stats:
+            try:
+                self._stats[path] = _stat(path, self.dir_fd)
+            except OSError:
+                self._stats[path] = None
+        return self._stats[path]
+
+    def put(self, path, stat_result):
+        self._stats[path] = stat_result
+
+    def invalidate(self, path):
+        self._stats.pop(path, None)
+
+    def clear(self):
+        self._stats.clear()
+
 def find_prompt_files(directory):
-    """Find all .prompt files that are not already completed"""
-    prompt_pattern = os.path.join(directory, "*.prompt")
-    all_prompts = glob.glob(prompt_pattern)
+    """Find uncompleted .prompt files as (path, stat_result) pairs for the StatCache"""
+    prompt_files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            # *.prompt never matches .prompt.complete or .prompt.error, and
+            # is_file() answers from the directory entry's type without a stat
+            if entry.name.endswith('.prompt') and entry.is_file():
+                try:
+                    prompt_files.append((entry.path, entry.stat()))
+                except OSError:
+                    continue
+
+    return prompt_files
+
+def is_locked(filepath, dir_fd=None):
+    """Check if another process holds a flock on the file (e.g. mid-append)"""
+    if fcntl is None:
+        return False
 
-    # Filter out .prompt.complete files and get only base .prompt files
-    ready_prompts = []
-    for prompt_file in all_prompts:
-        if not prompt_file.endswith('.prompt.complete'):
-            ready_prompts.append(prompt_file)
+    if dir_fd is None:
+        fd = os.open(filepath, os.O_RDONLY)
+    else:
+        fd = os.open(os.path.basename(filepath), os.O_RDONLY, dir_fd=dir_fd)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return False
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
 
-    return ready_prompts
+def is_file_ready(filepath, wait_time=0.2, from_event=False, stat_result=None, dir_fd=None,
+                  stable_age=_STABLE_AGE):
+    """Check if file is stable (not being written to)"""
+    if from_event:
+        return True
 
-def is_file_ready(filepath, wait_time=2):
-    """Check if file is stable (not being written to) by comparing size"""
     try:
-        size1 = os.path.getsize(filepath)
+        if stat_result is None:
+            stat_result = _stat(filepath, dir_fd)
+        if time.time() - stat_result.st_mtime >= stable_age:
+            return True
+
+        size1 = stat_result.st_size
         time.sleep(wait_time)
-        size2 = os.path.getsize(filepath)
-        return size1 == size2
+        size2 = _stat(filepath, dir_fd).st_size
+        return size1 == size2 and not is_locked(filepath, dir_fd)
     except (OSError, FileNotFoundError):
         return False
 
+# Child processes in the middle of a job, so a shutdown can kill them
+# instead of waiting up to two hours for each one to finish
+_running_jobs = set()
+_running_jobs_lock = threading.Lock()
+_jobs_killed = False  # set once shutdown has begun
+
+def _job_started(proc):
+    with _running_jobs_lock:
+        _running_jobs.add(proc)
+        if _jobs_killed:
+            proc.kill()  # started just as shutdown began
+
+def _job_finished(proc):
+    with _running_jobs_lock:
+        _running_jobs.discard(proc)
+
+def kill_running_jobs():
+    """Kill every child still working on a file, so its pool thread returns"""
+    global _jobs_killed
+    with _running_jobs_lock:
+        _jobs_killed = True
+        for proc in _running_jobs:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+
+def _pump_lines(pipe, tail, log):
+    """Copy lines from a child's pipe to its log file, keeping only the tail"""
+    for line in pipe:
+        tail.append(line)
+        log.write(line)
+
 def process_prompt_file(prompt_file, llama_script_path, verbose=False, python_executable=None):
-    """Process a single .prompt file using ollama-conversation.py"""
+    """Process a single .prompt file using ollama-conversation.py, logging to <file>.log"""
     if verbose:
         print(f"Processing: {prompt_file}")
 
@@ -97,26 +265,44 @@ def process_prompt_file(prompt_file, llama_script_path, verbose=False, python_ex
         if verbose:
             cmd.append("--verbose")
 
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=7200  # 2 hour timeout
-        )
-
-        if result.returncode == 0:
+        stdout_tail = deque(maxlen=200)
+        stderr_tail = deque(maxlen=200)
+        with open(prompt_file + ".log", 'wb') as log, \
+                subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+            readers = [
+                threading.Thread(target=_pump_lines, args=(proc.stdout, stdout_tail, log), daemon=True),
+                threading.Thread(target=_pump_lines, args=(proc.stderr, stderr_tail, log), daemon=True),
+            ]
+            for reader in readers:
+                reader.start()
+
+            _job_started(proc)
+            try:
+                returncode = proc.wait(timeout=7200)  # 2 hour timeout
+            finally:
+                _job_finished(proc)
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+                for reader in readers:
+                    reader.join()
+
+        stdout = b"".join(stdout_tail)
+        stderr = b"".join(stderr_tail)
+
+        if returncode == 0:
             if verbose:
                 print(f"✓ Successfully processed: {prompt_file}")
-                if result.stdout:
-                    print(f"Output: {result.stdout}")
+                if stdout:
+                    print(f"Output: {stdout.decode('utf-8', errors='replace')}")
             return True
         else:
             print(f"✗ Error processing {prompt_file}:")
-            print(f"Return code: {result.returncode}")
-            if result.stderr:
-                print(f"Error: {result.stderr}")
-            if result.stdout:
-                print(f"Output: {result.stdout}")
+            print(f"Return code: {returncode}")
+            if stderr:
+                print(f"Error: {stderr.decode('utf-8', errors='replace')}")
+            if stdout:
+                print(f"Output: {stdout.decode('utf-8', errors='replace')}")
             return False
 
     except subprocess.TimeoutExpired:
@@ -126,7 +312,123 @@ def process_prompt_file(prompt_file, llama_script_path, verbose=False, python_ex
         print(f"✗ Exception processing {prompt_file}: {e}")
         return False
 
-def mark_as_complete(prompt_file, success=True):
+class LlamaWorker:
+    """Long-lived ollama-conversation.py --serve process fed one file at a time"""
+
+    def __init__(self, llama_script_path, verbose=False, python_executable=None):
+        self.cmd = [python_executable or sys.executable, llama_script_path, "--serve"]
+        if verbose:
+            self.cmd.append("--verbose")
+        self.verbose = verbose
+        self.proc = None
+
+    def _start(self):
+        self.proc = subprocess.Popen(
+            self.cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1
+        )
+
+    def submit(self, prompt_file, timeout=7200) -> bool:
+        """Process one .prompt file in the worker; returns True on success"""
+        if self.verbose:
+            print(f"Processing: {prompt_file}")
+
+        if self.proc is None or self.proc.poll() is not None:
+            self._start()
+
+        proc = self.proc
+        _job_started(proc)
+        try:
+            return self._submit(prompt_file, timeout)
+        finally:
+            _job_finished(proc)
+
+    def _submit(self, prompt_file, timeout):
+        try:
+            self.proc.stdin.write(prompt_file + "\n")
+            self.proc.stdin.flush()
+
+            ready, _, _ = select.select([self.proc.stdout], [], [], timeout)
+            if not ready:
+                print(f"✗ Timeout processing {prompt_file} (exceeded {timeout // 60} minutes)")
+                self.close()
+                return False
+
+            line = self.proc.stdout.readline()
+        except OSError as e:
+            print(f"✗ Exception processing {prompt_file}: {e}")
+            self.close()
+            return False
+
+        if not line:
+            print(f"✗ Error processing {prompt_file}:")
+            print(f"Worker exited with code {self.proc.wait()}")
+            self.proc = None
+            return False
+
+        try:
+            reply = json.loads(line)
+        except ValueError:
+            reply = None
+        if not isinstance(reply, dict):
+            # Stray output has put the pipe out of step; start a fresh worker
+            print(f"✗ Error processing {prompt_file}:")
+            print(f"Unexpected worker output: {line.rstrip()}")
+            self.close()
+            return False
+
+        output = reply.get("output")
+        if reply.get("ok"):
+            if self.verbose:
+                print(f"✓ Successfully processed: {prompt_file}")
+                if output:
+                    print(f"Output: {output}")
+            return True
+        else:
+            print(f"✗ Error processing {prompt_file}:")
+            if output:
+                print(f"Output: {output}")
+            return False
+
+    def close(self):
+        """Stop the worker process, if running"""
+        if self.proc is None:
+            return
+
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+
+def _drop_cached_pages(filepath, dir_fd=None):
+    """Ask the kernel to evict a finished file's pages from the page cache"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+
+    try:
+        if dir_fd is None:
+            fd = os.open(filepath, os.O_RDONLY)
+        else:
+            fd = os.open(os.path.basename(filepath), os.O_RDONLY, dir_fd=dir_fd)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def mark_as_complete(prompt_file, success=True, dir_fd=None):
     """Rename .prompt file to .prompt.complete or .prompt.error"""
     try:
         if success:
@@ -134,12 +436,27 @@ def mark_as_complete(prompt_file, success=True):
         else:
             new_name = prompt_file + ".error"
 
-        os.rename(prompt_file, new_name)
+        if dir_fd is None:
+            os.rename(prompt_file, new_name)
+        else:
+            os.rename(os.path.basename(prompt_file), os.path.basename(new_name),
+                      src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+        _drop_cached_pages(new_name, dir_fd)
         return new_name
     except OSError as e:
         print(f"Warning: Could not rename {prompt_file}: {e}")
         return None
 
+# Open log files, kept for the life of the process instead of reopened per line
+_log_handles = {}
+
+def _close_log_handles():
+    for log_fh in _log_handles.values():
+        log_fh.close()
+    _log_handles.clear()
+
+atexit.register(_close_log_handles)
+
 def log_activity(message, log_file=None):
     """Log activity with timestamp"""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -149,25 +466,26 @@ def log_activity(message, log_file=None):
 
     if log_file:
         try:
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(log_message + "\n")
+            log_fh = _log_handles.get(log_file)
+            if log_fh is None:
+                # Line-buffered, so every message still reaches the file at once
+                log_fh = _log_handles[log_file] = open(log_file, 'a', encoding='utf-8', buffering=1)
+            log_fh.write(log_message + "\n")
         except Exception as e:
             print(f"Warning: Could not write to log file {log_file}: {e}")
 
+@functools.lru_cache(maxsize=1)
 def find_llama_script():
     """Try to find ollama-conversation.py in common locations"""
     possible_locations = [
-        "ollama-conversation.py",  # Current directory
         os.path.join(os.path.dirname(__file__), "ollama-conversation.py"),  # Same dir as monitor
+        "ollama-conversation.py",  # Current directory
         os.path.expanduser("~/ollama-conversation.py"),  # Home directory
         "/usr/local/bin/ollama-conversation.py",  # System location
     ]
 
-    for location in possible_locations:
-        if os.path.isfile(location) and os.access(location, os.X_OK):
-            return location
-
-    return None
+    return next((location for location in possible_locations
+                 if os.path.isfile(location) and os.access(location, os.X_OK)), None)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -201,7 +519,8 @@ Examples:
         "--interval",
         type=int,
         default=60,
-        help="Seconds between checks in continuous mode (default: 60)"
+        help="Seconds between checks in continuous mode; with inotify, seconds between "
+             "housekeeping sweeps (default: 60)"
     )
 
     parser.add_argument(
@@ -219,6 +538,19 @@ Examples:
         help="Python executable to use (useful for venv)"
     )
 
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=1,
+        help="Number of prompt files to process at once (default: 1)"
+    )
+
+    parser.add_argument(
+        "--no-worker",
+        action="store_true",
+        help="Start a fresh ollama-conversation.py process per file instead of reusing one"
+    )
+
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -249,23 +581,96 @@ Examples:
         print(f"Error: ollama-conversation.py script not found at: {llama_script}")
         sys.exit(1)
 
+    if args.max_concurrency < 1:
+        print("Error: --max-concurrency must be at least 1")
+        sys.exit(1)
+
     log_activity(f"Monitor started for directory: {args.directory}", args.log)
     log_activity(f"Using llama script: {llama_script}", args.log)
 
+    # Stat, probe and rename by basename under one open descriptor (POSIX only)
+    dir_fd = None
+    if hasattr(os, 'O_DIRECTORY') and {os.stat, os.rename} <= os.supports_dir_fd:
+        dir_fd = os.open(args.directory, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+
+    # LlamaWorker waits on its pipe with select(), which Windows only
+    # supports for sockets, so each file gets its own process there
+    if os.name != 'posix':
+        args.no_worker = True
+
+    # Each pass stats a file at most once; cleared before every pass
+    stat_cache = StatCache(dir_fd)
+
+    # Each job is a subprocess, so threads are enough to overlap them
+    executor = ThreadPoolExecutor(max_workers=args.max_concurrency)
+
+    # One persistent worker per pool thread, started on first use
+    worker_local = threading.local()
+    workers = []
+
+    def run_prompt_file(prompt_file):
+        """Process one file in this thread's worker, or one-shot with --no-worker"""
+        if args.no_worker:
+            return process_prompt_file(prompt_file, llama_script, args.verbose, args.python)
+
+        worker = getattr(worker_local, "worker", None)
+        if worker is None:
+            worker = worker_local.worker = LlamaWorker(llama_script, args.verbose, args.python)
+            workers.append(worker)
+        return worker.submit(prompt_file)
+
+    # Directory mtime when a sweep last found no .prompt files; unchanged means still empty
+    empty_dir_mtime = None
+
     def process_directory():
         """Process all ready prompt files in the directory"""
-        prompt_files = find_prompt_files(args.directory)
+        nonlocal empty_dir_mtime
+        if dir_fd is not None:
+            dir_mtime = os.fstat(dir_fd).st_mtime_ns
+        else:
+            dir_mtime = os.stat(args.directory).st_mtime_ns
+
+        prompt_files = []
+        if dir_mtime != empty_dir_mtime:
+            stat_cache.clear()
+            for prompt_file, stat_result in find_prompt_files(args.directory):
+                stat_cache.put(prompt_file, stat_result)
+                prompt_files.append(prompt_file)
 
         if not prompt_files:
+            # Only trust an mtime that is safely in the past; a file created
+            # within the same timestamp tick would otherwise go unnoticed
+            if time.time_ns() - dir_mtime > 1_000_000_000:
+                empty_dir_mtime = dir_mtime
             if args.verbose:
                 log_activity("No .prompt files found to process", args.log)
             return 0
 
+        empty_dir_mtime = None
+
+        return process_files(prompt_files)
+
+    def process_files(prompt_files, from_events=False):
+        """Process the given prompt files, skipping any that are not ready"""
         processed_count = 0
+        ready_files = []
+
+        # Wait once for the whole batch, and only if some file may still be growing
+        if not from_events:
+            now = time.time()
+            if any(stat_result is not None and now - stat_result.st_mtime < _STABLE_AGE
+                   for stat_result in map(stat_cache.get, prompt_files)):
+                time.sleep(0.2)
 
         for prompt_file in prompt_files:
+            # Events can name files that were renamed since (e.g. our own appends)
+            stat_result = stat_cache.get(prompt_file)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+
             # Check if file is stable (not being written to)
-            if not is_file_ready(prompt_file):
+            if not is_file_ready(prompt_file, wait_time=0, from_event=from_events,
+                                 stat_result=stat_result, dir_fd=dir_fd):
                 if args.verbose:
                     log_activity(f"Skipping {prompt_file} (still being written)", args.log)
                 continue
@@ -275,29 +680,94 @@ Examples:
                 processed_count += 1
                 continue
 
+            ready_files.append(prompt_file)
+
+        # Process the files, up to --max-concurrency at a time
+        futures = {}
+        for prompt_file in ready_files:
             log_activity(f"Processing: {prompt_file}", args.log)
+            future = executor.submit(run_prompt_file, prompt_file)
+            futures[future] = prompt_file
 
-            # Process the file
-            success = process_prompt_file(prompt_file, llama_script, args.verbose, args.python)
+        def record(future):
+            """Rename a finished job's file; returns True if it was renamed"""
+            prompt_file = futures.pop(future)
+            success = future.result()
 
             # Mark as complete or error
-            new_name = mark_as_complete(prompt_file, success)
+            new_name = mark_as_complete(prompt_file, success, dir_fd)
+            stat_cache.invalidate(prompt_file)
             if new_name:
                 status = "completed" if success else "failed"
                 log_activity(f"File {status}: {prompt_file} -> {new_name}", args.log)
-                processed_count += 1
-            else:
-                log_activity(f"Could not rename file: {prompt_file}", args.log)
+                return True
+            log_activity(f"Could not rename file: {prompt_file}", args.log)
+            return False
+
+        try:
+            for future in as_completed(list(futures)):
+                processed_count += record(future)
+        except KeyboardInterrupt:
+            # Cancel queued jobs and kill running ones; rename whatever finished
+            # or still succeeded, and leave the rest queued
+            finished = [future for future in futures if future.done()]
+            for future in futures:
+                future.cancel()
+            kill_running_jobs()
+            wait(futures)
+            for future in list(futures):
+                if future.cancelled():
+                    continue
+                if future in finished or future.result():
+                    record(future)
+            raise
 
         return processed_count
 
     # Main processing loop
     monitor = OllamaMonitor()
+
+    def handle_sigterm(signum, frame):
+        """Stop like Ctrl+C so workers and descriptors are cleaned up"""
+        monitor.stop()
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
     if monitor.is_busy():
         log_activity("Ollama is active. Aborting.")
-        sys.exit(2) 
+        monitor.close()
+        sys.exit(2)
     try:
-        if args.continuous:
+        if args.continuous and inotify_simple is not None:
+            log_activity(f"Starting continuous monitoring with inotify (housekeeping interval: {args.interval}s)", args.log)
+            flags = inotify_simple.flags
+            with inotify_simple.INotify() as inotify:
+                # Watch before the first sweep so nothing lands in between
+                inotify.add_watch(args.directory, flags.CLOSE_WRITE | flags.MOVED_TO)
+                count = process_directory()
+                last_sweep = time.monotonic()
+                while True:
+                    if count > 0:
+                        log_activity(f"Processed {count} files", args.log)
+
+                    # Block until a .prompt file is written or moved in, or until
+                    # the next housekeeping sweep is due
+                    remaining = args.interval - (time.monotonic() - last_sweep)
+                    events = inotify.read(timeout=max(int(remaining * 1000), 0))
+
+                    # Sweep every --interval even while events keep arriving, and
+                    # at once if the kernel dropped events
+                    overflow = any(e.mask & flags.Q_OVERFLOW for e in events)
+                    if overflow or time.monotonic() - last_sweep >= args.interval:
+                        count = process_directory()
+                        last_sweep = time.monotonic()
+                    else:
+                        stat_cache.clear()
+                        names = dict.fromkeys(e.name for e in events if e.name.endswith('.prompt'))
+                        count = process_files([os.path.join(args.directory, name) for name in names],
+                                              from_events=True)
+        elif args.continuous:
             log_activity(f"Starting continuous monitoring (interval: {args.interval}s)", args.log)
             while True:
                 count = process_directory()
@@ -311,10 +781,18 @@ Examples:
             log_activity(f"Single run completed. Processed {count} files", args.log)
 
     except KeyboardInterrupt:
-        log_activity("Monitor stopped by user (Ctrl+C)", args.log)
+        log_activity("Monitor stopped by user (Ctrl+C) or SIGTERM", args.log)
     except Exception as e:
         log_activity(f"Monitor error: {e}", args.log)
         sys.exit(1)
+    finally:
+        kill_running_jobs()
+        executor.shutdown(cancel_futures=True)
+        for worker in workers:
+            worker.close()
+        if dir_fd is not None:
+            os.close(dir_fd)
+        monitor.close()
 
 if __name__ == "__main__":
     main()
@@ -10,32 +10,104 @@ import os
 import time
 import re
 import json
-from datetime import datetime
+import io
+import contextlib
+import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
 try:
-    import requests
+    import fcntl
 except ImportError:
-    print("Error: requests library is not installed.")
-    print("Install it with: pip install requests")
-    sys.exit(1)
+    fcntl = None  # Not available on Windows; appends are then unlocked
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Responses are parsed with the json module instead
+
+# orjson parses bytes directly and several times faster than json; its
+# JSONDecodeError subclasses json.JSONDecodeError, so handlers are shared
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# requests is imported by _get_session() on first use, so --help and
+# --dry-run never pay for loading it
+requests = None
+_SESSION = None
+
+# Seconds to wait for a TCP connection before giving up on the server
+_CONNECT_TIMEOUT = 5
+
+# Runs server round-trips that can overlap local work (threads start lazily)
+_BACKGROUND = ThreadPoolExecutor(max_workers=2)
+
+
+# Model lists fetched from /api/tags, keyed by server URL
+_MODEL_CACHE_PATH = os.path.expanduser('~/.cache/llama-conv/models.json')
+_MODEL_CACHE_TTL = 300  # seconds
+
+# /api/tags results from this process, keyed by server URL, as
+# (time.monotonic(), models); spares back-to-back lookups a second request
+_TAGS_MEMO = {}
+_TAGS_MEMO_TTL = 5  # seconds
+
+# Stop generation before the model starts writing the file's own markers
+# (built once; sent with every request)
+_STOP_SEQUENCES = ["---HUMAN---", "---AI---", "# Generated:"]
+
+# Trailing spaces/tabs at the end of any line of a message body
+_TRAILING_SPACE_RE = re.compile(r'[ \t]+$', re.MULTILINE)
+
+# Prompts under these limits may be routed to small_model_name
+_ROUTING_MAX_TOKENS = 256  # rough estimate for the whole conversation
+_ROUTING_MAX_WORDS = 20  # for the latest question
+
+# Timestamp comment lines written above each AI response (whole line, newline included)
+_TIMESTAMP_LINE_RE = re.compile(r'^[^\S\n]*# Generated:[^\n]*\n?', re.MULTILINE)
+
+
+def _int_or_none(value):
+    return None if value.lower() == 'none' else int(value)
+
+
+def _duration(value):
+    # Ollama takes '30m'-style strings, or plain seconds as a number (-1 = forever)
+    return int(value) if value.lstrip('-').isdigit() else value
+
+
+# Type conversion for config values; keys not listed here stay strings
+_CONFIG_TYPES = {
+    'max_tokens': _int_or_none,
+    'timeout': _int_or_none,
+    'max_history_turns': _int_or_none,
+    'keep_alive': _duration,
+    'temperature': float,
+    'top_p': float
+}
 
 
 def parse_prompt_file(filepath):
     """Parse a .prompt file into config and conversation sections"""
+    # Read the config line by line up to the first ---, then the conversation in one read
+    config_lines = []
+    conversation_part = None
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+        with open(filepath, 'r', encoding='utf-8', buffering=65536) as f:
+            for line in f:
+                head, sep, tail = line.partition('---')
+                if sep:
+                    config_lines.append(head)
+                    conversation_part = tail + f.read() if tail.strip() else f.read()
+                    break
+                config_lines.append(line)
     except FileNotFoundError:
         print(f"Error: Prompt file '{filepath}' not found.")
         sys.exit(1)
 
-    # Split on --- separator between config and conversation
-    if '---' not in content:
+    if conversation_part is None:
         print("Error: Prompt file must contain '---' separator between config and conversation")
         sys.exit(1)
 
-    config_part, conversation_part = content.split('---', 1)
-
     # Parse config (simple key: value format)
     config = {
         'max_tokens': 256,
@@ -43,88 +115,138 @@ def parse_prompt_file(filepath):
         'top_p': 0.9,
         'server_url': 'http://localhost:11434',
         'model_name': 'llama3.1:8b',  # Changed to smaller default model
-        'timeout': 180  # Added configurable timeout (3 minutes default)
+        'timeout': 180,  # Added configurable timeout (3 minutes default)
+        'max_history_turns': 20  # Exchanges sent to the model ('none' for all)
     }
 
-    for line in config_part.strip().split('\n'):
+    for line in config_lines:
         line = line.strip()
-        if line and ':' in line and not line.startswith('#'):
-            key, value = line.split(':', 1)
-            key = key.strip()
-            value = value.strip()
+        if not line or line.startswith('#'):
+            continue
 
-            # Strip inline comments (anything after #)
-            if '#' in value:
-                value = value.split('#')[0].strip()
+        # partition returns a fixed 3-tuple, no list to allocate per line
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
 
-            # Convert types
-            if key in ['max_tokens', 'timeout']:
-                config[key] = int(value) if value.lower() != 'none' else None
-            elif key in ['temperature', 'top_p']:
-                config[key] = float(value)
-            else:
-                config[key] = value
+        # Strip inline comments (anything after #)
+        value = value.partition('#')[0].strip()
 
-    return config, conversation_part.strip()
+        # Convert types (unknown keys stay strings)
+        key = key.strip()
+        config[key] = _CONFIG_TYPES.get(key, str)(value)
+
+    # Sections are stripped individually, so skip a whole-body strip() copy
+    return config, conversation_part
 
 
 def parse_conversation_sections(conversation_text):
     """Parse conversation into alternating human/AI sections"""
-    # Split by our section markers
-    sections = re.split(r'---(?:HUMAN|AI)---', conversation_text)
+    # Single forward scan for the whole ---HUMAN--- / ---AI--- markers;
+    # content is sliced out between consecutive headers
+    parsed_sections = []
+    current_type = None
+    content_start = 0
+    next_human = conversation_text.find('---HUMAN---')
+    next_ai = conversation_text.find('---AI---')
+
+    while next_human >= 0 or next_ai >= 0:
+        if next_ai < 0 or 0 <= next_human < next_ai:
+            header, i = 'human', next_human
+            header_end = i + 11
+        else:
+            header, i = 'ai', next_ai
+            header_end = i + 8
+
+        # Look for the next of each marker past this header (a match that
+        # overlapped this header does not count)
+        if next_human < header_end:
+            next_human = conversation_text.find('---HUMAN---', header_end)
+        if next_ai < header_end:
+            next_ai = conversation_text.find('---AI---', header_end)
 
-    # Remove empty sections
-    sections = [s.strip() for s in sections if s.strip()]
+        # Text before the first header is kept untyped so it fails the check below
+        parsed_sections.append({
+            'type': current_type,
+            'content': conversation_text[content_start:i].strip()
+        })
+
+        current_type = header
+        content_start = header_end
+
+    parsed_sections.append({
+        'type': current_type,
+        'content': conversation_text[content_start:].strip()
+    })
 
-    # Find section headers to determine type
-    headers = re.findall(r'---(HUMAN|AI)---', conversation_text)
+    # Drop the (normally empty) untyped text before the first header
+    if parsed_sections[0]['type'] is None and not parsed_sections[0]['content']:
+        parsed_sections.pop(0)
 
-    if len(headers) != len(sections):
+    # Every section needs both a header and some content
+    if any(s['type'] is None or not s['content'] for s in parsed_sections):
         print("Error: Mismatched section headers and content")
         sys.exit(1)
 
-    parsed_sections = []
-    for header, content in zip(headers, sections):
-        parsed_sections.append({
-            'type': header.lower(),
-            'content': content.strip()
-        })
-
     return parsed_sections
 
 
-def build_ollama_messages(sections):
+def _normalize(content):
+    """Serialize a message body the same way on every run"""
+    return _TRAILING_SPACE_RE.sub('', content).strip()
+
+
+def build_ollama_messages(sections, max_history_turns=None, system_prompt=None):
     """Build Ollama chat messages format from parsed sections"""
     messages = []
 
+    if system_prompt:
+        messages.append({
+            "role": "system",
+            "content": _normalize(system_prompt)
+        })
+
     for section in sections:
         if section['type'] == 'human':
             messages.append({
                 "role": "user",
-                "content": section['content']
+                "content": _normalize(section['content'])
             })
         elif section['type'] == 'ai':
-            # Filter out timestamp comment lines from AI content
-            ai_lines = []
-            for line in section['content'].split('\n'):
-                # Skip timestamp comment lines (they may now include token info)
-                if line.strip().startswith('# Generated:'):
-                    continue
-                ai_lines.append(line)
-
-            clean_ai_content = '\n'.join(ai_lines).strip()
+            # Filter out timestamp comment lines (they may now include token info);
+            # slice off the leading one and only run the regex if another remains
+            content = section['content']
+            if content.startswith('# Generated:'):
+                newline = content.find('\n')
+                content = content[newline + 1:] if newline >= 0 else ''
+            if '# Generated:' in content:
+                content = _TIMESTAMP_LINE_RE.sub('', content)
+            clean_ai_content = _normalize(content)
             if clean_ai_content:  # Only add if there's actual content
                 messages.append({
                     "role": "assistant",
                     "content": clean_ai_content
                 })
 
+    # Cap the history: keep the system prompt, the opening exchange and the
+    # last max_history_turns exchanges, dropping whole exchanges in between
+    if max_history_turns:
+        user_starts = [i for i, m in enumerate(messages) if m['role'] == 'user']
+        if len(user_starts) > max_history_turns + 1:
+            messages = messages[:user_starts[1]] + messages[user_starts[-max_history_turns]:]
+
     return messages
 
 
+# Echoed tokens are flushed once this many bytes are pending, at the end of
+# a sentence or line, or when this long has passed since the last flush
+_ECHO_FLUSH_BYTES = 64
+_ECHO_FLUSH_INTERVAL = 0.05  # seconds
+
+
 def append_response_to_file(filepath, response_text, generation_time, token_info=None):
     """Append the AI response to the prompt file with clear separation"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
 
     # Build stats line with generation time and token info
     stats_line = f"# Generated: {timestamp} ({generation_time:.1f}s"
@@ -132,25 +254,69 @@ def append_response_to_file(filepath, response_text, generation_time, token_info
         stats_line += f", {token_info['prompt_tokens']} prompt + {token_info['completion_tokens']} completion = {token_info['total_tokens']} tokens"
     stats_line += ")\n"
 
-    with open(filepath, 'a', encoding='utf-8') as f:
-        f.write(f"\n\n---AI---\n")
-        f.write(stats_line)
-        f.write(response_text.strip())
-        f.write(f"\n\n---HUMAN---\n")
+    # Encode once and append in a single write, holding an exclusive lock so
+    # concurrent runs on the same file cannot interleave their blocks
+    payload = f"\n\n---AI---\n{stats_line}{response_text.strip()}\n\n---HUMAN---\n".encode('utf-8')
+    fd = os.open(filepath, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)  # Also releases the lock
+
+
+def _get_session():
+    """Import requests and build the shared session on first use"""
+    global requests, _SESSION
+
+    if _SESSION is None:
+        try:
+            import requests as requests_module
+        except ImportError:
+            print("Error: requests library is not installed.")
+            print("Install it with: pip install requests")
+            sys.exit(1)
+
+        requests = requests_module
+        _SESSION = requests.Session()
+        _SESSION.headers.update({'Accept': 'application/json', 'Connection': 'keep-alive'})
+        for prefix in ('http://', 'https://'):
+            _SESSION.mount(prefix, requests.adapters.HTTPAdapter(
+                max_retries=2, pool_connections=4, pool_maxsize=8))
+
+    return _SESSION
+
+
+def close_session():
+    """Close the shared session's pooled connections, if it was created"""
+    global _SESSION
+
+    if _SESSION is not None:
+        _SESSION.close()
+        _SESSION = None
 
 
 def test_server_connection(server_url, verbose=False):
     """Test if the Ollama server is reachable and list available models"""
+    memo = _TAGS_MEMO.get(server_url)
+    if memo and time.monotonic() - memo[0] < _TAGS_MEMO_TTL:
+        return True, memo[1]
+
+    session = _get_session()
     try:
         if verbose:
             print("Testing Ollama server connection...")
 
         # Check if Ollama is running with a shorter timeout
-        response = requests.get(f"{server_url}/api/tags", timeout=5)
+        response = session.get(f"{server_url}/api/tags", timeout=5)
         response.raise_for_status()
 
-        models_data = response.json()
+        models_data = _json_loads(response.content)
         available_models = [model['name'] for model in models_data.get('models', [])]
+        _TAGS_MEMO[server_url] = (time.monotonic(), available_models)
 
         if verbose:
             print(f"✓ Connected to Ollama server. Available models:")
@@ -176,16 +342,17 @@ def test_server_connection(server_url, verbose=False):
 
 def check_model_status(server_url, model_name, verbose=False):
     """Check if a model is loaded and ready to use"""
+    session = _get_session()
     try:
         # Try to get model info
-        response = requests.post(
+        response = session.post(
             f"{server_url}/api/show",
             json={"name": model_name},
             timeout=10
         )
 
         if response.status_code == 200:
-            model_info = response.json()
+            model_info = _json_loads(response.content)
             if verbose:
                 print(f"✓ Model {model_name} is available")
                 # Print model size if available
@@ -206,13 +373,75 @@ def check_model_status(server_url, model_name, verbose=False):
         return True  # Assume it's okay and let the chat request handle it
 
 
+class ModelNotFoundError(Exception):
+    """Raised when Ollama reports that the requested model does not exist"""
+
+
+def _read_model_cache():
+    try:
+        with open(_MODEL_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _write_model_cache(cache):
+    # Write a temp file and rename it into place, so concurrent runs never
+    # read a half-written cache
+    tmp_path = f"{_MODEL_CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(_MODEL_CACHE_PATH), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, _MODEL_CACHE_PATH)
+    except OSError:
+        # The cache is only an optimization
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+
+
+def _load_model_cache(server_url):
+    """Return the cached model list for server_url, or None if missing or stale"""
+    entry = _read_model_cache().get(server_url)
+    if not isinstance(entry, dict):
+        return None
+    timestamp, models = entry.get('timestamp'), entry.get('models')
+    if (not isinstance(timestamp, (int, float)) or not isinstance(models, list)
+            or time.time() - timestamp >= _MODEL_CACHE_TTL):
+        return None
+    return models
+
+
+def _save_model_cache(server_url, available_models):
+    cache = _read_model_cache()
+    cache[server_url] = {'timestamp': time.time(), 'models': available_models}
+    _write_model_cache(cache)
+
+
+def _invalidate_model_cache(server_url):
+    _TAGS_MEMO.pop(server_url, None)
+    cache = _read_model_cache()
+    if cache.pop(server_url, None) is not None:
+        _write_model_cache(cache)
+
+
 def validate_model_name(server_url, model_name, verbose=False):
     """Validate that the specified model is available on Ollama"""
+    # A recent model list saves a round-trip to /api/tags on every run
+    cached_models = _load_model_cache(server_url)
+    if cached_models and model_name in cached_models:
+        if verbose:
+            print(f"✓ Model {model_name} is available (cached model list)")
+        return model_name
+
     success, available_models = test_server_connection(server_url, verbose=False)
 
     if not success:
         return False
 
+    _save_model_cache(server_url, available_models)
+
     if model_name not in available_models:
         print(f"Warning: Model '{model_name}' not found on server.")
         if available_models:
@@ -224,12 +453,115 @@ def validate_model_name(server_url, model_name, verbose=False):
             print("Pull a model with: ollama pull llama3.1:8b")
             return False
 
-    # Check if model is loaded and ready
-    check_model_status(server_url, model_name, verbose)
+    # The model is in the list, so /api/show can only add details; only
+    # spend the round-trip when they will be printed
+    if verbose:
+        check_model_status(server_url, model_name, verbose)
 
     return model_name
 
 
+def _preload_model(session, server_url, model_name, keep_alive, timeout):
+    """Ask Ollama to load the model now, so loading overlaps local work"""
+    payload = {"model": model_name, "prompt": ""}
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+
+    try:
+        session.post(
+            f"{server_url}/api/generate",
+            json=payload,
+            timeout=(_CONNECT_TIMEOUT, timeout)
+        ).close()
+    except Exception:
+        pass
+
+
+def is_model_available(server_url, model_name):
+    """Check the (cached) model list without falling back to another model"""
+    available_models = _load_model_cache(server_url)
+    if available_models is None:
+        success, available_models = test_server_connection(server_url, verbose=False)
+        if not success:
+            return False
+        _save_model_cache(server_url, available_models)
+
+    return model_name in available_models
+
+
+def is_simple_prompt(messages):
+    """Guess whether a conversation is short and simple enough for a small model"""
+    # ~4 characters per token is close enough for a routing decision
+    approx_tokens = sum(len(m['content']) for m in messages) // 4
+    question = messages[-1]['content']
+    return (approx_tokens < _ROUTING_MAX_TOKENS
+            and '?' in question
+            and len(question.split()) < _ROUTING_MAX_WORDS
+            and '```' not in question)
+
+
+def _iter_lines(response, chunk_size):
+    """response.iter_lines, raising a stall past the read timeout as ReadTimeout"""
+    try:
+        yield from response.iter_lines(chunk_size=chunk_size, decode_unicode=False)
+    except requests.exceptions.ConnectionError as e:
+        # requests wraps a mid-stream read timeout in ConnectionError
+        if e.args and isinstance(e.args[0], requests.packages.urllib3.exceptions.ReadTimeoutError):
+            raise requests.exceptions.ReadTimeout(e) from e
+        raise
+
+
+def _accumulate_stream(response, echo=False):
+    """Collect a streamed /api/chat response into the non-streaming shape"""
+    response_parts = []  # joined once at the end; += on str is quadratic
+    final_chunk = {}
+
+    out = None
+    if echo:
+        sys.stdout.flush()  # keep earlier print() output ahead of raw writes
+        # Write encoded bytes straight to the binary buffer, skipping print's
+        # per-call overhead; --serve captures stdout in a StringIO with none
+        out = getattr(sys.stdout, 'buffer', None)
+        encoding = sys.stdout.encoding or 'utf-8'
+        pending = 0
+        last_flush = float('-inf')  # so the first token shows up at once
+
+    # Read to the end so the connection goes back to the pool
+    for line in _iter_lines(response, chunk_size=65536):
+        if not line:
+            continue
+        try:
+            chunk_data = _json_loads(line)
+        except json.JSONDecodeError:
+            continue
+
+        if 'error' in chunk_data:
+            raise Exception(f"Ollama error: {chunk_data['error']}")
+
+        content = chunk_data.get('message', {}).get('content')
+        if content:
+            if out is not None:
+                pending += out.write(content.encode(encoding, errors='replace'))
+                now = time.monotonic()
+                if (pending >= _ECHO_FLUSH_BYTES or content[-1] in '.!?\n'
+                        or now - last_flush >= _ECHO_FLUSH_INTERVAL):
+                    out.flush()
+                    pending = 0
+                    last_flush = now
+            elif echo:
+                print(content, end="", flush=True)
+            response_parts.append(content)
+
+        if chunk_data.get('done', False):
+            final_chunk = chunk_data
+
+    if out is not None:
+        out.flush()
+
+    final_chunk['message'] = {'role': 'assistant', 'content': "".join(response_parts)}
+    return final_chunk
+
+
 def generate_ollama_response(server_url, model_name, messages, config, stream=False, verbose=False):
     """Generate response using Ollama's native API with better error handling"""
 
@@ -237,10 +569,11 @@ def generate_ollama_response(server_url, model_name, messages, config, stream=Fa
     payload = {
         "model": model_name,
         "messages": messages,
-        "stream": stream,
+        "stream": True,
         "options": {
             "temperature": config['temperature'],
-            "top_p": config['top_p']
+            "top_p": config['top_p'],
+            "stop": _STOP_SEQUENCES
         }
     }
 
@@ -248,121 +581,104 @@ def generate_ollama_response(server_url, model_name, messages, config, stream=Fa
     if config['max_tokens'] is not None:
         payload["options"]["num_predict"] = config['max_tokens']
 
+    # Only override the server's OLLAMA_KEEP_ALIVE when the file asks to;
+    # a loaded model keeps llama-prompt-monitor.py from starting
+    if 'keep_alive' in config:
+        payload["keep_alive"] = config['keep_alive']
+
     if verbose:
         print(f"Sending request to: {server_url}/api/chat")
         print(f"Using timeout: {config.get('timeout', 180)}s")
         print(f"Model: {model_name}")
 
+    session = _get_session()
     try:
         timeout = config.get('timeout', 180)  # Use configurable timeout
 
-        response = requests.post(
+        # orjson serializes the (possibly long) message history to bytes in
+        # one fast call; json.dumps is the fallback
+        if orjson is not None:
+            data = orjson.dumps(payload)
+        else:
+            data = json.dumps(payload).encode('utf-8')
+
+        response = session.post(
             f"{server_url}/api/chat",
-            json=payload,
-            stream=stream,
-            timeout=timeout
+            data=data,
+            headers={'Content-Type': 'application/json'},
+            stream=True,
+            timeout=(_CONNECT_TIMEOUT, timeout)
         )
+        if response.status_code == 404:
+            raise ModelNotFoundError(f"Model '{model_name}' not found on server")
         response.raise_for_status()
 
-        if stream:
-            return response
-        else:
-            return response.json()
+        return _accumulate_stream(response, echo=stream)
 
     except requests.exceptions.Timeout:
-        raise Exception(f"Request timed out after {timeout} seconds. Try using a smaller model or increasing the timeout in your config.")
+        raise Exception(f"Request timed out: no data from the server for {timeout} seconds. Try using a smaller model or increasing the timeout in your config.")
     except requests.exceptions.ConnectionError:
         raise Exception("Connection lost to Ollama server. Check if it's still running.")
     except requests.exceptions.RequestException as e:
         raise Exception(f"Request failed: {e}")
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Conversational LLaMA with Ollama server (Improved)",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
-.prompt file format:
-  server_url: http://localhost:11434        # Ollama server URL
-  model_name: llama3.1:8b                   # Ollama model name (8b recommended)
-  max_tokens: 256                           # or 'none' for unlimited
-  temperature: 0.7
-  timeout: 180                              # Request timeout in seconds
-
-  ---
-  ---HUMAN---
-  Your first question here
-
-  ---AI---
-  # Generated: timestamp (duration)
-  AI's response (automatically added)
-
-  ---HUMAN---
-  Your next question here
-
-Requires Ollama to be running:
-  ollama serve
-
-And a model to be pulled:
-  ollama pull llama3.1:8b
-
-Example:
-  python llama-conversation-ollama.py conversation.prompt
-        """
-    )
-
-    parser.add_argument(
-        "prompt_file",
-        help="Path to the .prompt file"
-    )
-
-    parser.add_argument(
-        "--verbose",
-        action="store_true",
-        help="Enable verbose output"
-    )
-
-    parser.add_argument(
-        "--dry-run",
-        action="store_true",
-        help="Show what would be sent to the model without actually running it"
-    )
-
-    parser.add_argument(
-        "--stream",
-        action="store_true",
-        help="Enable streaming responses (print as generated)"
-    )
-
-    parser.add_argument(
-        "--timeout",
-        type=int,
-        help="Override request timeout in seconds"
-    )
+def extract_token_info(response_data):
+    """Pull prompt/completion token counts out of a final Ollama chat response"""
+    prompt_tokens = response_data.get('prompt_eval_count', 0)
+    completion_tokens = response_data.get('eval_count', 0)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens
+    }
 
-    args = parser.parse_args()
 
+def process_prompt_file(prompt_file, args, retry_missing_model=True):
+    """Generate a response for one .prompt file and append it to the file"""
     # Parse the prompt file
-    config, conversation_text = parse_prompt_file(args.prompt_file)
+    config, conversation_text = parse_prompt_file(prompt_file)
 
     # Override timeout if provided via command line
     if args.timeout:
         config['timeout'] = args.timeout
 
-    # Parse into sections
-    sections = parse_conversation_sections(conversation_text)
+    # Validate the model while the conversation is parsed (not possible with
+    # small-model routing, where the model depends on the messages)
+    validation = None
+    if not args.dry_run and not config.get('small_model_name'):
+        session = _get_session()
+        validation = _BACKGROUND.submit(
+            validate_model_name, config['server_url'], config['model_name'], args.verbose)
+        # Start loading a cold model now; a daemon thread never delays exit
+        threading.Thread(
+            target=_preload_model,
+            args=(session, config['server_url'], config['model_name'],
+                  config.get('keep_alive'), config.get('timeout')),
+            daemon=True
+        ).start()
 
-    if not sections:
-        print("Error: No conversation sections found")
-        sys.exit(1)
+    try:
+        # Parse into sections
+        sections = parse_conversation_sections(conversation_text)
 
-    # Check if the last section is a human prompt
-    if sections[-1]['type'] != 'human':
-        print("Error: Last section must be a human prompt to generate a response")
-        sys.exit(1)
+        if not sections:
+            print("Error: No conversation sections found")
+            sys.exit(1)
+
+        # Check if the last section is a human prompt
+        if sections[-1]['type'] != 'human':
+            print("Error: Last section must be a human prompt to generate a response")
+            sys.exit(1)
 
-    # Build messages for Ollama API
-    messages = build_ollama_messages(sections)
+        # Build messages for Ollama API
+        messages = build_ollama_messages(sections, config['max_history_turns'], config.get('system'))
+    except BaseException:
+        # Let the validation finish its output before the caller moves on
+        # (--serve captures each file's output separately)
+        if validation is not None:
+            wait([validation])
+        raise
 
     if args.dry_run:
         print("=== PARSED SECTIONS ===")
@@ -378,8 +694,21 @@ Example:
         return
 
     try:
+        # Send short, simple questions to the small model when one is configured
+        small_model = config.get('small_model_name')
+        if small_model and is_simple_prompt(messages):
+            if is_model_available(config['server_url'], small_model):
+                if args.verbose:
+                    print(f"Routing short prompt to small model: {small_model}")
+                config['model_name'] = small_model
+            elif args.verbose:
+                print(f"⚠ Small model {small_model} not available, using {config['model_name']}")
+
         # Test server connection and validate model
-        validated_model = validate_model_name(config['server_url'], config['model_name'], args.verbose)
+        if validation is not None:
+            validated_model = validation.result()
+        else:
+            validated_model = validate_model_name(config['server_url'], config['model_name'], args.verbose)
         if not validated_model:
             sys.exit(1)
 
@@ -401,15 +730,12 @@ Example:
             print("\nGenerating response...")
 
         # Generate response
-        token_info = None
-
         if args.stream:
             # Streaming response
             print("\n=== STREAMING RESPONSE ===")
-            response_text = ""
 
             try:
-                stream_response = generate_ollama_response(
+                response_data = generate_ollama_response(
                     config['server_url'],
                     config['model_name'],
                     messages,
@@ -417,38 +743,14 @@ Example:
                     stream=True,
                     verbose=args.verbose
                 )
-
-                final_chunk = None
-                for line in stream_response.iter_lines():
-                    if line:
-                        try:
-                            chunk_data = json.loads(line.decode('utf-8'))
-                            if 'message' in chunk_data and 'content' in chunk_data['message']:
-                                content = chunk_data['message']['content']
-                                print(content, end="", flush=True)
-                                response_text += content
-
-                            # Check if this is the final chunk and save token info
-                            if chunk_data.get('done', False):
-                                final_chunk = chunk_data
-                                break
-                        except json.JSONDecodeError:
-                            continue
-
                 print()  # New line after streaming
 
-                # Extract token info from final chunk
-                if final_chunk:
-                    token_info = {
-                        'prompt_tokens': final_chunk.get('prompt_eval_count', 0),
-                        'completion_tokens': final_chunk.get('eval_count', 0),
-                        'total_tokens': final_chunk.get('prompt_eval_count', 0) + final_chunk.get('eval_count', 0)
-                    }
-
+            except ModelNotFoundError:
+                raise  # retried below with a fresh model list
             except Exception as e:
                 print(f"\nStreaming failed: {e}")
-                print("Falling back to non-streaming mode...")
-                # Fall back to non-streaming
+                print("Retrying once without printing the response...")
+                # Fall back to a quiet run
                 response_data = generate_ollama_response(
                     config['server_url'],
                     config['model_name'],
@@ -457,14 +759,6 @@ Example:
                     stream=False,
                     verbose=args.verbose
                 )
-                response_text = response_data['message']['content']
-
-                # Extract token info from fallback response
-                token_info = {
-                    'prompt_tokens': response_data.get('prompt_eval_count', 0),
-                    'completion_tokens': response_data.get('eval_count', 0),
-                    'total_tokens': response_data.get('prompt_eval_count', 0) + response_data.get('eval_count', 0)
-                }
 
         else:
             # Non-streaming response
@@ -476,14 +770,11 @@ Example:
                 stream=False,
                 verbose=args.verbose
             )
-            response_text = response_data['message']['content']
 
-            # Extract token info from response
-            token_info = {
-                'prompt_tokens': response_data.get('prompt_eval_count', 0),
-                'completion_tokens': response_data.get('eval_count', 0),
-                'total_tokens': response_data.get('prompt_eval_count', 0) + response_data.get('eval_count', 0)
-            }
+        response_text = response_data['message']['content']
+
+        # Extract token info from the final chunk, if the stream got that far
+        token_info = extract_token_info(response_data) if response_data.get('done') else None
 
         # Calculate generation time
         generation_time = time.time() - start_time
@@ -492,22 +783,18 @@ Example:
         generated_text = response_text.strip()
 
         # Remove any timestamp comment lines that might have been generated
-        cleaned_lines = []
-        for line in generated_text.split('\n'):
-            if line.strip().startswith('# Generated:'):
-                continue
-            cleaned_lines.append(line)
-
-        generated_text = '\n'.join(cleaned_lines).strip()
+        # (rare now that '# Generated:' is a stop sequence, so check first)
+        if '# Generated:' in generated_text:
+            generated_text = _TIMESTAMP_LINE_RE.sub('', generated_text).strip()
 
         if args.verbose and not args.stream:
             print(f"\n=== GENERATED RESPONSE ===")
             print(generated_text)
 
         # Append response to the prompt file
-        append_response_to_file(args.prompt_file, generated_text, generation_time, token_info)
+        append_response_to_file(prompt_file, generated_text, generation_time, token_info)
 
-        print(f"\nResponse appended to: {args.prompt_file}")
+        print(f"\nResponse appended to: {prompt_file}")
         if args.verbose:
             stats = f"Generated {len(generated_text)} characters in {generation_time:.1f}s"
             if token_info and token_info['total_tokens'] > 0:
@@ -515,6 +802,13 @@ Example:
                 stats += f" ({token_info['total_tokens']} tokens total, {tokens_per_sec:.1f} tokens/sec)"
             print(stats)
 
+    except ModelNotFoundError as e:
+        # The cached model list was stale; refresh it and try once more
+        _invalidate_model_cache(config['server_url'])
+        if retry_missing_model:
+            return process_prompt_file(prompt_file, args, retry_missing_model=False)
+        print(f"Error: {str(e)}")
+        sys.exit(1)
     except Exception as e:
         print(f"Error: {str(e)}")
         if args.verbose:
@@ -523,5 +817,163 @@ Example:
         sys.exit(1)
 
 
+def try_process_prompt_file(prompt_file, args):
+    """Run process_prompt_file, reporting failure instead of exiting"""
+    try:
+        process_prompt_file(prompt_file, args)
+    except SystemExit as e:
+        return not e.code
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return False
+    return True
+
+
+def serve(args):
+    """Process prompt files named on stdin, replying with one JSON line each"""
+    for line in sys.stdin:
+        prompt_file = line.strip()
+        if not prompt_file:
+            continue
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            ok = try_process_prompt_file(prompt_file, args)
+
+        reply = {"prompt_file": prompt_file, "ok": ok, "output": output.getvalue()}
+        sys.stdout.write(json.dumps(reply) + "\n")
+        sys.stdout.flush()
+
+
+def run_batch(args):
+    """Process every .prompt file in a directory in one run"""
+    if not os.path.isdir(args.batch):
+        print(f"Error: Directory '{args.batch}' does not exist")
+        sys.exit(1)
+
+    prompt_files = sorted(glob.glob(os.path.join(args.batch, "*.prompt")))
+    if not prompt_files:
+        print(f"No .prompt files found in {args.batch}")
+        return
+
+    failed = []
+    for prompt_file in prompt_files:
+        print(f"=== {prompt_file} ===")
+        if not try_process_prompt_file(prompt_file, args):
+            failed.append(prompt_file)
+
+    print(f"\nBatch complete: {len(prompt_files) - len(failed)}/{len(prompt_files)} files succeeded")
+    for prompt_file in failed:
+        print(f"  failed: {prompt_file}")
+
+    if failed:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Conversational LLaMA with Ollama server (Improved)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+.prompt file format:
+  server_url: http://localhost:11434        # Ollama server URL
+  model_name: llama3.1:8b                   # Ollama model name (8b recommended)
+  max_tokens: 256                           # or 'none' for unlimited
+  temperature: 0.7
+  timeout: 180                              # Max seconds to wait for more of the response
+  max_history_turns: 20                     # Recent exchanges to send ('none' for all)
+  keep_alive: 30m                           # Optional: how long the model stays loaded after a run
+  small_model_name: llama3.2:1b             # Optional: model for short, simple questions
+  system: You are a concise assistant.      # Optional: system prompt sent first
+
+  ---
+  ---HUMAN---
+  Your first question here
+
+  ---AI---
+  # Generated: timestamp (duration)
+  AI's response (automatically added)
+
+  ---HUMAN---
+  Your next question here
+
+Ollama reuses its cached prompt prefix when the earlier turns are unchanged,
+so editing older turns (or the system prompt) makes the next run re-process
+the whole conversation.
+
+Requires Ollama to be running:
+  ollama serve
+
+And a model to be pulled:
+  ollama pull llama3.1:8b
+
+Example:
+  python llama-conversation-ollama.py conversation.prompt
+
+Persistent mode (one path per line on stdin, one JSON result line out):
+  echo conversation.prompt | python llama-conversation-ollama.py --serve
+
+Batch mode (every .prompt file in a directory, one after another):
+  python llama-conversation-ollama.py --batch ./jobs
+        """
+    )
+
+    parser.add_argument(
+        "prompt_file",
+        nargs="?",
+        help="Path to the .prompt file"
+    )
+
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Enable verbose output"
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show what would be sent to the model without actually running it"
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Enable streaming responses (print as generated)"
+    )
+
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        help="Override request timeout in seconds"
+    )
+
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Stay running and process .prompt paths read from stdin, one per line"
+    )
+
+    parser.add_argument(
+        "--batch",
+        metavar="DIR",
+        help="Process every .prompt file in DIR in a single run"
+    )
+
+    args = parser.parse_args()
+
+    try:
+        if args.serve:
+            serve(args)
+        elif args.batch:
+            run_batch(args)
+        elif args.prompt_file:
+            process_prompt_file(args.prompt_file, args)
+        else:
+            parser.error("a prompt_file is required unless --serve or --batch is given")
+    finally:
+        close_session()
+
+
 if __name__ == "__main__":
     main()